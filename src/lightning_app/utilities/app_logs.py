@@ -33,6 +33,13 @@ class _LogEvent:
     component_name: str
     labels: _LogEventLabels
 
+    # only the timestamps are compared to order the events, the other fields are never looked at
+    def __lt__(self, other: "_LogEvent") -> bool:
+        return self.timestamp < other.timestamp
+
+    def __le__(self, other: "_LogEvent") -> bool:
+        return self.timestamp <= other.timestamp
+
     def __ge__(self, other: "_LogEvent") -> bool:
         return self.timestamp >= other.timestamp
 
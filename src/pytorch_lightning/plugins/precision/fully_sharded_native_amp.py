@@ -29,6 +29,8 @@ else:
 class FullyShardedNativeMixedPrecisionPlugin(ShardedNativeMixedPrecisionPlugin):
     """Native AMP for Fully Sharded Training."""
 
+    _mixed_precision_config: Optional[MixedPrecision] = None
+
     def clip_grad_by_norm(self, *_: Any, **__: Any) -> None:
         # see https://fairscale.readthedocs.io/en/latest/api/nn/fsdp.html
         # section `Gradient Clipping`, using `torch.nn.utils.clip_grad_norm_` is incorrect
@@ -41,6 +43,9 @@ class FullyShardedNativeMixedPrecisionPlugin(ShardedNativeMixedPrecisionPlugin):
 
     @property
     def mixed_precision_config(self) -> Optional[MixedPrecision]:
+        # the precision does not change, so the same config is returned on every access
+        if self._mixed_precision_config is not None:
+            return self._mixed_precision_config
         assert MixedPrecision is not None
         if self.precision == PrecisionType.HALF:
             dtype = torch.float16
@@ -48,8 +53,9 @@ class FullyShardedNativeMixedPrecisionPlugin(ShardedNativeMixedPrecisionPlugin):
             dtype = torch.bfloat16
         else:
             raise MisconfigurationException(f"Was unable to infer precision type, received {self.precision!r}.")
-        return MixedPrecision(
+        self._mixed_precision_config = MixedPrecision(
             param_dtype=dtype,
             reduce_dtype=dtype,
             buffer_dtype=dtype,
         )
+        return self._mixed_precision_config
@@ -14,20 +14,40 @@
 import logging
 import os
 import uuid
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
-from torch.utils.data import DataLoader
+import torch
 
 import pytorch_lightning as pl
 from pytorch_lightning.loggers.logger import DummyLogger
 from pytorch_lightning.utilities.data import has_len_all_ranks
 from pytorch_lightning.utilities.exceptions import MisconfigurationException
-from pytorch_lightning.utilities.memory import garbage_collection_cuda, is_oom_error
+from pytorch_lightning.utilities.imports import _TORCH_GREATER_EQUAL_1_10
+from pytorch_lightning.utilities.memory import _empty_cuda_cache, garbage_collection_cuda, is_oom_error
 from pytorch_lightning.utilities.parsing import lightning_getattr, lightning_hasattr, lightning_setattr
 from pytorch_lightning.utilities.rank_zero import rank_zero_warn
 
 log = logging.getLogger(__name__)
 
+_IMMUTABLE_TYPES = (int, float, bool, complex, str, bytes, type(None))
+
+
+@dataclass
+class _BatchSizeSearch:
+    """Bookkeeping shared by the trials of a single batch size search."""
+
+    # the train dataset does not change between trials so its length is only looked up once
+    max_batch_size: Optional[int] = None
+    max_batch_size_known: bool = False
+    # (batch size, outcome, next batch size) of every adjustment, logged together once the search is done
+    trials: List[Tuple[int, str, int]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return "\n".join(f"  {old:>6} {desc}, next {new}" for old, desc, new in self.trials)
+
 
 def scale_batch_size(
     trainer: "pl.Trainer",
@@ -37,6 +57,7 @@ def scale_batch_size(
     init_val: int = 2,
     max_trials: int = 25,
     batch_arg_name: str = "batch_size",
+    batch_size_align: Optional[int] = None,
 ) -> Optional[int]:
     """See :meth:`~pytorch_lightning.tuner.tuning.Tuner.scale_batch_size`"""
     if trainer.fast_dev_run:
@@ -58,9 +79,11 @@ def scale_batch_size(
             " Please disable the feature or incorporate the dataloader into the model."
         )
 
+    if batch_size_align is not None and batch_size_align < 1:
+        raise MisconfigurationException(f"`batch_size_align` should be at least 1, got {batch_size_align}.")
+
     # Save initial model, that is loaded after batch size is found
-    ckpt_path = os.path.join(trainer.default_root_dir, f".scale_batch_size_{uuid.uuid4()}.ckpt")
-    trainer.save_checkpoint(ckpt_path)
+    checkpoint, ckpt_path = __scale_batch_dump_state(trainer)
     params = __scale_batch_dump_params(trainer)
 
     # Set to values that are required by the algorithm
@@ -71,15 +94,22 @@ def scale_batch_size(
 
     # Initially we just double in size until an OOM is encountered
     new_size, _ = _adjust_batch_size(trainer, batch_arg_name, value=init_val)  # initially set to init_val
+    search = _BatchSizeSearch()
     if mode == "power":
-        new_size = _run_power_scaling(trainer, model, new_size, batch_arg_name, max_trials)
+        new_size = _run_power_scaling(trainer, model, new_size, batch_arg_name, max_trials, search)
     elif mode == "binsearch":
-        new_size = _run_binsearch_scaling(trainer, model, new_size, batch_arg_name, max_trials)
+        if batch_size_align is None:
+            batch_size_align = _default_batch_size_align(trainer)
+        new_size = _run_binsearch_scaling(
+            trainer, model, new_size, batch_arg_name, max_trials, batch_size_align, search
+        )
     else:
         raise ValueError("mode in method `scale_batch_size` could either be `power` or `binsearch`")
 
     garbage_collection_cuda()
-    log.info(f"Finished batch size finder, will continue with full run using batch size {new_size}")
+    log.info("Finished batch size finder, will continue with full run using batch size %d", new_size)
+    if search.trials:
+        log.info("Batch size finder trials:\n%s", search.summary())
 
     __scale_batch_restore_params(trainer, params)
 
@@ -87,12 +117,78 @@ def scale_batch_size(
         trainer.progress_bar_callback.enable()
 
     # Restore initial state of model
-    trainer._checkpoint_connector.restore(ckpt_path)
-    trainer.strategy.remove_checkpoint(ckpt_path)
+    __scale_batch_restore_state(trainer, checkpoint, ckpt_path)
 
     return new_size
 
 
+def __scale_batch_dump_state(trainer: "pl.Trainer") -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Snapshots the model and training state in memory, falling back to a checkpoint file in
+    ``trainer.default_root_dir`` if the copy does not fit in memory."""
+    checkpoint = trainer._checkpoint_connector.dump_checkpoint()
+    try:
+        # `restore_training_state` only restores the optimizers and schedulers when fitting, so their states are not
+        # kept. The weights are the bulk of the rest, keeping them on the host leaves the device memory to the trials
+        snapshot = {
+            key: _fast_clone(value, to_cpu=key == "state_dict")
+            for key, value in checkpoint.items()
+            if key not in ("optimizer_states", "lr_schedulers")
+        }
+        return snapshot, None
+    except RuntimeError as exception:
+        if not is_oom_error(exception):
+            raise
+    del checkpoint
+    garbage_collection_cuda()
+    ckpt_path = os.path.join(trainer.default_root_dir, f".scale_batch_size_{uuid.uuid4()}.ckpt")
+    trainer.save_checkpoint(ckpt_path)
+    return None, ckpt_path
+
+
+def _fast_clone(obj: Any, to_cpu: bool = False) -> Any:
+    """Copies a dumped checkpoint, which is mostly made of plain containers and python scalars, without the memo
+    and dispatch machinery of ``deepcopy``.
+
+    With ``to_cpu=True``, CUDA tensors are copied to host memory instead of the device.
+    """
+    obj_type = type(obj)
+    if obj_type in _IMMUTABLE_TYPES:
+        return obj
+    if isinstance(obj, torch.Tensor):
+        # the dumped state references the live tensors, which get updated in-place during the trials
+        obj = obj.detach()
+        if to_cpu and obj.is_cuda:
+            # pageable memory is returned to the OS once the snapshot is dropped, unlike the cached pinned memory
+            return obj.to("cpu")
+        return obj.clone()
+    if obj_type in (dict, OrderedDict):
+        clone = obj_type((key, _fast_clone(value, to_cpu)) for key, value in obj.items())
+        if hasattr(obj, "_metadata"):
+            # the module state dict versions are needed by `load_state_dict`
+            clone._metadata = deepcopy(obj._metadata)
+        return clone
+    if obj_type in (list, tuple):
+        return obj_type(_fast_clone(value, to_cpu) for value in obj)
+    return deepcopy(obj)
+
+
+def __scale_batch_restore_state(
+    trainer: "pl.Trainer", checkpoint: Optional[Dict[str, Any]], ckpt_path: Optional[str]
+) -> None:
+    if ckpt_path is not None:
+        trainer._checkpoint_connector.restore(ckpt_path)
+        trainer.strategy.remove_checkpoint(ckpt_path)
+        return
+
+    connector = trainer._checkpoint_connector
+    connector._loaded_checkpoint = checkpoint
+    connector.restore_datamodule()
+    connector.restore_model()
+    connector.restore_callbacks()
+    connector.restore_training_state()
+    connector.resume_end()
+
+
 def __scale_batch_dump_params(trainer: "pl.Trainer") -> Dict[str, Any]:
     return {
         "max_steps": trainer.fit_loop.max_steps,
@@ -123,23 +219,44 @@ def __scale_batch_restore_params(trainer: "pl.Trainer", params: Dict[str, Any])
 
 
 def _run_power_scaling(
-    trainer: "pl.Trainer", model: "pl.LightningModule", new_size: int, batch_arg_name: str, max_trials: int
+    trainer: "pl.Trainer",
+    model: "pl.LightningModule",
+    new_size: int,
+    batch_arg_name: str,
+    max_trials: int,
+    search: Optional[_BatchSizeSearch] = None,
 ) -> int:
     """Batch scaling mode where the size is doubled at each iteration until an OOM error is encountered."""
+    memory_samples: List[Tuple[int, int]] = []
     for _ in range(max_trials):
-        garbage_collection_cuda()
+        # a full `gc.collect()` is only needed to recover from an OOM
+        _empty_cuda_cache()
         trainer.fit_loop.global_step = 0  # reset after each try
         try:
             # Try fit
+            baseline = _reset_peak_memory_stats(trainer)
             trainer.tuner._run(model)
+            _record_peak_memory(trainer, new_size, baseline, memory_samples)
+            last_successful_size = new_size
             # Double in size
-            new_size, changed = _adjust_batch_size(trainer, batch_arg_name, factor=2.0, desc="succeeded")
+            new_size, changed = _adjust_batch_size(trainer, batch_arg_name, factor=2.0, desc="succeeded", search=search)
+            if changed and _predicts_oom(trainer, new_size, memory_samples):
+                # skip the doomed trial and go back to the last size that fit, halving would undershoot it if the
+                # doubled size was capped to the dataset length
+                new_size, _ = _adjust_batch_size(
+                    trainer,
+                    batch_arg_name,
+                    value=last_successful_size,
+                    desc="is predicted to run out of memory",
+                    search=search,
+                )
+                break
         except RuntimeError as exception:
             # Only these errors should trigger an adjustment
             if is_oom_error(exception):
                 # If we fail in power mode, half the size and return
                 garbage_collection_cuda()
-                new_size, _ = _adjust_batch_size(trainer, batch_arg_name, factor=0.5, desc="failed")
+                new_size, _ = _adjust_batch_size(trainer, batch_arg_name, factor=0.5, desc="failed", search=search)
                 break
             else:
                 raise  # some other error not memory related
@@ -154,34 +271,63 @@ def _run_power_scaling(
 
 
 def _run_binsearch_scaling(
-    trainer: "pl.Trainer", model: "pl.LightningModule", new_size: int, batch_arg_name: str, max_trials: int
+    trainer: "pl.Trainer",
+    model: "pl.LightningModule",
+    new_size: int,
+    batch_arg_name: str,
+    max_trials: int,
+    batch_size_align: int = 1,
+    search: Optional[_BatchSizeSearch] = None,
 ) -> int:
     """Batch scaling mode where the size is initially is doubled at each iteration until an OOM error is
     encountered.
 
-    Hereafter, the batch size is further refined using a binary search
+    Hereafter, the batch size is further refined using a binary search over multiples of ``batch_size_align``
     """
+    # every size tried so far is either at most `low` (succeeded) or at least `high` (failed), and the next size
+    # is always strictly between them, so no size is ever tried twice
     low = 1
     high = None
     count = 0
+    memory_samples: List[Tuple[int, int]] = []
     while True:
-        garbage_collection_cuda()
+        # a full `gc.collect()` is only needed to recover from an OOM
+        _empty_cuda_cache()
         trainer.fit_loop.global_step = 0  # reset after each try
         try:
             # Try fit
+            baseline = _reset_peak_memory_stats(trainer)
             trainer.tuner._run(model)
+            _record_peak_memory(trainer, new_size, baseline, memory_samples)
             count += 1
             if count > max_trials:
                 break
             # Double in size
             low = new_size
             if high:
-                if high - low <= 1:
+                midval = _aligned_midpoint(low, high, batch_size_align)
+                if midval is None:
                     break
-                midval = (high + low) // 2
-                new_size, changed = _adjust_batch_size(trainer, batch_arg_name, value=midval, desc="succeeded")
+                new_size, changed = _adjust_batch_size(
+                    trainer, batch_arg_name, value=midval, desc="succeeded", search=search
+                )
             else:
-                new_size, changed = _adjust_batch_size(trainer, batch_arg_name, factor=2.0, desc="succeeded")
+                new_size, changed = _adjust_batch_size(
+                    trainer, batch_arg_name, factor=2.0, desc="succeeded", search=search
+                )
+                if changed and _predicts_oom(trainer, new_size, memory_samples):
+                    # skip the doomed trial and treat it as if it had run out of memory
+                    high = new_size
+                    midval = _aligned_midpoint(low, high, batch_size_align)
+                    new_size, changed = _adjust_batch_size(
+                        trainer,
+                        batch_arg_name,
+                        value=low if midval is None else midval,
+                        desc="is predicted to run out of memory",
+                        search=search,
+                    )
+                    if midval is None:
+                        break
 
             if changed:
                 # Force the train dataloader to reset as the batch size has changed
@@ -196,9 +342,15 @@ def _run_binsearch_scaling(
                 # If we fail in power mode, half the size and return
                 garbage_collection_cuda()
                 high = new_size
-                midval = (high + low) // 2
-                new_size, _ = _adjust_batch_size(trainer, batch_arg_name, value=midval, desc="failed")
-                if high - low <= 1:
+                midval = _aligned_midpoint(low, high, batch_size_align)
+                new_size, _ = _adjust_batch_size(
+                    trainer,
+                    batch_arg_name,
+                    value=low if midval is None else midval,
+                    desc="failed",
+                    search=search,
+                )
+                if midval is None:
                     break
             else:
                 raise  # some other error not memory related
@@ -206,12 +358,73 @@ def _run_binsearch_scaling(
     return new_size
 
 
+def _default_batch_size_align(trainer: "pl.Trainer") -> int:
+    """Returns the batch size multiple that the matrix multiplication kernels of the device run fastest with."""
+    device = trainer.strategy.root_device
+    if device.type != "cuda":
+        return 1
+    major, _ = torch.cuda.get_device_capability(device)
+    return 64 if major >= 8 else 8
+
+
+def _aligned_midpoint(low: int, high: int, align: int) -> Optional[int]:
+    """Returns the multiple of ``align`` strictly between ``low`` and ``high`` that is closest to their
+    midpoint, or ``None`` if there is none left to try."""
+    midpoint = (high + low) // 2
+    below = midpoint // align * align
+    candidates = [size for size in (below, below + align) if low < size < high]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda size: abs(size - midpoint))
+
+
+def _reset_peak_memory_stats(trainer: "pl.Trainer") -> Optional[int]:
+    """Resets the peak memory statistics of the device and returns the memory allocated before the trial, or
+    ``None`` if the memory cannot be tracked.
+
+    The statistics are shared by the whole process, so peaks recorded before the search are lost.
+    """
+    device = trainer.strategy.root_device
+    if not _TORCH_GREATER_EQUAL_1_10 or device.type != "cuda":
+        return None
+    torch.cuda.reset_peak_memory_stats(device)
+    return torch.cuda.memory_allocated(device)
+
+
+def _record_peak_memory(
+    trainer: "pl.Trainer", batch_size: int, baseline: Optional[int], memory_samples: List[Tuple[int, int]]
+) -> None:
+    if baseline is None:
+        return
+    peak = torch.cuda.max_memory_allocated(trainer.strategy.root_device) - baseline
+    memory_samples.append((batch_size, peak))
+
+
+def _predicts_oom(trainer: "pl.Trainer", batch_size: int, memory_samples: List[Tuple[int, int]]) -> bool:
+    """Linearly extrapolates the peak memory of the last two successful trials to ``batch_size`` and compares
+    it to the memory still available on the device."""
+    if len(memory_samples) < 2:
+        return False
+    (size_1, peak_1), (size_2, peak_2) = memory_samples[-2:]
+    if size_1 == size_2:
+        return False
+    slope = (peak_2 - peak_1) / (size_2 - size_1)
+    predicted_peak = peak_2 + slope * (batch_size - size_2)
+
+    device = trainer.strategy.root_device
+    free, _ = torch.cuda.mem_get_info(device)
+    # memory held by the caching allocator can be reused without going through `cudaMalloc`
+    available = free + torch.cuda.memory_reserved(device) - torch.cuda.memory_allocated(device)
+    return predicted_peak > 0.95 * available
+
+
 def _adjust_batch_size(
     trainer: "pl.Trainer",
     batch_arg_name: str = "batch_size",
     factor: float = 1.0,
     value: Optional[int] = None,
     desc: Optional[str] = None,
+    search: Optional[_BatchSizeSearch] = None,
 ) -> Tuple[int, bool]:
     """Helper function for adjusting the batch size.
 
@@ -228,6 +441,9 @@ def _adjust_batch_size(
 
         desc: either `succeeded` or `failed`. Used purely for logging
 
+        search: if given, the length of the train dataset is looked up once and stored in it, and the
+            adjustment is recorded in its trials
+
     Returns:
         The new batch size for the next trial and a bool that signals whether the
         new value is different than the previous batch size.
@@ -235,17 +451,34 @@ def _adjust_batch_size(
     model = trainer.lightning_module
     batch_size = lightning_getattr(model, batch_arg_name)
     new_size = value if value is not None else int(batch_size * factor)
-    if desc:
-        log.info(f"Batch size {batch_size} {desc}, trying batch size {new_size}")
 
-    if not _is_valid_batch_size(new_size, trainer.train_dataloader, trainer):
-        new_size = min(new_size, len(trainer.train_dataloader.dataset))
+    max_size = _max_batch_size(trainer, search)
+    if max_size is not None:
+        new_size = min(new_size, max_size)
+
+    if desc:
+        log.debug("Batch size %d %s, trying batch size %d", batch_size, desc, new_size)
+        if search is not None:
+            search.trials.append((batch_size, desc, new_size))
 
-    changed = new_size != batch_size
+    if new_size == batch_size:
+        # `lightning_setattr` walks the model, its hparams and the datamodule
+        return batch_size, False
     lightning_setattr(model, batch_arg_name, new_size)
-    return new_size, changed
+    return new_size, True
 
 
-def _is_valid_batch_size(batch_size: int, dataloader: DataLoader, trainer: "pl.Trainer"):
+def _max_batch_size(trainer: "pl.Trainer", search: Optional[_BatchSizeSearch] = None) -> Optional[int]:
+    """Returns the length of the train dataset, which bounds the batch size, or ``None`` if it has no length."""
+    if search is not None and search.max_batch_size_known:
+        return search.max_batch_size
+    dataloader = trainer.train_dataloader
+    if dataloader is None:
+        # not loaded before the first trial
+        return None
     module = trainer.lightning_module or trainer.datamodule
-    return not has_len_all_ranks(dataloader, trainer.strategy, module) or batch_size <= len(dataloader)
+    max_size = len(dataloader.dataset) if has_len_all_ranks(dataloader, trainer.strategy, module) else None
+    if search is not None:
+        search.max_batch_size = max_size
+        search.max_batch_size_known = True
+    return max_size
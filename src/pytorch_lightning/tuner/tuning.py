@@ -91,6 +91,7 @@ class Tuner:
         init_val: int = 2,
         max_trials: int = 25,
         batch_arg_name: str = "batch_size",
+        batch_size_align: Optional[int] = None,
     ) -> Optional[int]:
         """Iteratively try to find the largest batch size for a given model that does not give an out of memory
         (OOM) error.
@@ -128,6 +129,10 @@ class Tuner:
                 - ``model``
                 - ``model.hparams``
                 - ``trainer.datamodule`` (the datamodule passed to the tune method)
+
+            batch_size_align: only used in ``'binsearch'`` mode. The binary search only tries multiples of this
+                value, which are faster for the matrix multiplication kernels. Defaults to 64 on CUDA devices
+                with compute capability 8.0 or higher, 8 on older CUDA devices and 1 otherwise.
         """
         self.trainer.auto_scale_batch_size = True
         result = self.trainer.tune(
@@ -141,6 +146,7 @@ class Tuner:
                 "init_val": init_val,
                 "max_trials": max_trials,
                 "batch_arg_name": batch_arg_name,
+                "batch_size_align": batch_size_align,
             },
         )
         self.trainer.auto_scale_batch_size = False
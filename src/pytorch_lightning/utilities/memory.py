@@ -88,6 +88,11 @@ def is_out_of_cpu_memory(exception: BaseException) -> bool:
 def garbage_collection_cuda() -> None:
     """Garbage collection Torch (CUDA) memory."""
     gc.collect()
+    _empty_cuda_cache()
+
+
+def _empty_cuda_cache() -> None:
+    """Release the cached Torch (CUDA) memory without collecting Python garbage."""
     try:
         # This is the last thing that should cause an OOM error, but seemingly it can.
         torch.cuda.empty_cache()
@@ -4,8 +4,17 @@ from unittest.mock import MagicMock
 from lightning_app.utilities.app_logs import _LogEvent
 
 
+def _uncomparable_mock():
+    mock = MagicMock()
+    for name in ("__lt__", "__le__", "__gt__", "__ge__"):
+        getattr(mock, name).side_effect = AssertionError(f"{name} should not be called")
+    return mock
+
+
 def test_log_event():
-    event_1 = _LogEvent("", datetime.now(), MagicMock(), MagicMock())
-    event_2 = _LogEvent("", datetime.now(), MagicMock(), MagicMock())
+    event_1 = _LogEvent("", datetime.now(), _uncomparable_mock(), _uncomparable_mock())
+    event_2 = _LogEvent("", datetime.now(), _uncomparable_mock(), _uncomparable_mock())
     assert event_1 < event_2
     assert event_1 <= event_2
+    assert event_2 > event_1
+    assert event_2 >= event_1
@@ -40,6 +40,7 @@ def test_precision_plugin_config(precision, expected):
     assert config.param_dtype == expected
     assert config.buffer_dtype == expected
     assert config.reduce_dtype == expected
+    assert plugin.mixed_precision_config is config
 
 
 @RunIf(min_torch="1.12")
@@ -13,6 +13,7 @@
 # limitations under the License.
 import os
 from copy import deepcopy
+from unittest import mock
 
 import pytest
 import torch
@@ -21,6 +22,13 @@ from torch.utils.data import DataLoader
 import tests_pytorch.helpers.utils as tutils
 from pytorch_lightning import Trainer
 from pytorch_lightning.demos.boring_classes import BoringDataModule, BoringModel, RandomDataset
+from pytorch_lightning.tuner.batch_size_scaling import (
+    _adjust_batch_size,
+    _aligned_midpoint,
+    _BatchSizeSearch,
+    _fast_clone,
+    _predicts_oom,
+)
 from pytorch_lightning.tuner.tuning import Tuner
 from pytorch_lightning.utilities import AMPType
 from pytorch_lightning.utilities.exceptions import MisconfigurationException
@@ -96,6 +104,67 @@ def test_model_reset_correctly(tmpdir):
     assert not any(f for f in os.listdir(tmpdir) if f.startswith(".scale_batch_size"))
 
 
+def test_model_state_kept_in_memory(tmpdir):
+    """Check that the initial state is snapshotted in memory instead of being written to disk."""
+    model = BatchSizeModel(batch_size=2)
+    trainer = Trainer(default_root_dir=tmpdir, max_epochs=1)
+    connector = trainer._checkpoint_connector
+
+    loaded_checkpoints = []
+    restore_training_state = connector.restore_training_state
+
+    def _restore_training_state():
+        loaded_checkpoints.append(connector._loaded_checkpoint)
+        restore_training_state()
+
+    with mock.patch.object(trainer, "save_checkpoint") as save_mock, mock.patch.object(
+        connector, "restore"
+    ) as restore_mock, mock.patch.object(connector, "restore_training_state", side_effect=_restore_training_state):
+        trainer.tuner.scale_batch_size(model, max_trials=2)
+    save_mock.assert_not_called()
+    restore_mock.assert_not_called()
+
+    # the optimizer and scheduler states are not restored while tuning, so they are left out of the snapshot
+    snapshot = loaded_checkpoints[-1]
+    assert "state_dict" in snapshot
+    assert "optimizer_states" not in snapshot
+    assert "lr_schedulers" not in snapshot
+
+
+def test_model_state_falls_back_to_checkpoint_file(tmpdir):
+    """Check that the initial state is written to a checkpoint file if the in-memory snapshot does not fit."""
+    tutils.reset_seed()
+
+    model = BatchSizeModel(batch_size=2)
+    trainer = Trainer(default_root_dir=tmpdir, max_epochs=1)
+
+    before_state_dict = deepcopy(model.state_dict())
+
+    with mock.patch(
+        "pytorch_lightning.tuner.batch_size_scaling._fast_clone", side_effect=RuntimeError("CUDA out of memory.")
+    ), mock.patch.object(trainer, "save_checkpoint", wraps=trainer.save_checkpoint) as save_mock:
+        trainer.tuner.scale_batch_size(model, max_trials=5)
+    save_mock.assert_called_once()
+
+    after_state_dict = model.state_dict()
+    for key in before_state_dict.keys():
+        assert torch.all(
+            torch.eq(before_state_dict[key], after_state_dict[key])
+        ), "Model was not reset correctly after scaling batch size"
+
+    assert not any(f for f in os.listdir(tmpdir) if f.startswith(".scale_batch_size"))
+
+
+def test_dataset_length_looked_up_once(tmpdir):
+    """Check that the length of the train dataset is only looked up once during the search."""
+    model = BatchSizeModel(batch_size=2)
+    trainer = Trainer(default_root_dir=tmpdir, max_epochs=1)
+
+    with mock.patch("pytorch_lightning.tuner.batch_size_scaling.has_len_all_ranks", return_value=True) as has_len_mock:
+        trainer.tuner.scale_batch_size(model, max_trials=3)
+    has_len_mock.assert_called_once()
+
+
 def test_trainer_reset_correctly(tmpdir):
     """Check that all trainer parameters are reset correctly after scaling batch size."""
     tutils.reset_seed()
@@ -264,6 +333,16 @@ def test_scale_batch_size_no_trials(tmpdir):
     assert result == 2
 
 
+@pytest.mark.parametrize("batch_size_align", [0, -8])
+def test_scale_batch_size_fails_with_invalid_align(tmpdir, batch_size_align):
+    """Check the tuning raises error when called with an alignment below 1."""
+    model = BatchSizeModel(batch_size=2)
+    trainer = Trainer(default_root_dir=tmpdir, max_epochs=1)
+
+    with pytest.raises(MisconfigurationException, match="`batch_size_align` should be at least 1"):
+        trainer.tuner.scale_batch_size(model, mode="binsearch", batch_size_align=batch_size_align)
+
+
 def test_scale_batch_size_fails_with_unavailable_mode(tmpdir):
     """Check the tuning raises error when called with mode that does not exist."""
 
@@ -298,3 +377,135 @@ def test_dataloader_reset_with_scale_batch_size(tmpdir, scale_method):
 
     assert trainer.train_dataloader.loaders.batch_size == new_batch_size
     assert trainer.val_dataloaders[0].batch_size == new_batch_size
+
+
+@mock.patch("pytorch_lightning.tuner.batch_size_scaling.torch.cuda")
+def test_predicts_oom_from_memory_samples(cuda_mock):
+    """Test that the peak memory of the next trial is extrapolated from the previous successful trials."""
+    trainer = mock.Mock()
+    trainer.strategy.root_device = torch.device("cuda", 0)
+    cuda_mock.mem_get_info.return_value = (900, 4000)
+    cuda_mock.memory_reserved.return_value = 300
+    cuda_mock.memory_allocated.return_value = 200
+
+    memory_samples = [(2, 250), (4, 450)]
+    assert not _predicts_oom(trainer, 8, memory_samples)
+    assert _predicts_oom(trainer, 16, memory_samples)
+    # a single sample is not enough to extrapolate
+    assert not _predicts_oom(trainer, 16, memory_samples[-1:])
+
+
+@pytest.mark.parametrize(
+    ["scale_method", "batch_size_align", "expected_tried", "expected"],
+    [
+        ("power", None, [2, 4, 8, 16, 32, 64], 64),
+        ("binsearch", 1, [2, 4, 8, 16, 32, 64, 82, 91, 95, 97, 98, 99], 99),
+        ("binsearch", 64, [2, 4, 8, 16, 32, 64], 64),
+    ],
+)
+def test_scale_batch_size_skips_trials_predicted_to_oom(
+    tmpdir, scale_method, batch_size_align, expected_tried, expected
+):
+    """Test that a trial predicted to run out of memory is treated as failed without being run."""
+
+    class LargerDatasetModel(BatchSizeModel):
+        def train_dataloader(self):
+            return DataLoader(RandomDataset(32, 100), batch_size=self.batch_size)
+
+    model = LargerDatasetModel(batch_size=2)
+    trainer = Trainer(default_root_dir=tmpdir, max_epochs=1, limit_val_batches=0)
+
+    tried = []
+    run = trainer.tuner._run
+
+    def _run(model):
+        tried.append(model.batch_size)
+        return run(model)
+
+    with mock.patch.object(trainer.tuner, "_run", side_effect=_run), mock.patch(
+        "pytorch_lightning.tuner.batch_size_scaling._predicts_oom",
+        side_effect=lambda trainer, batch_size, memory_samples: batch_size > 64,
+    ):
+        new_batch_size = trainer.tuner.scale_batch_size(
+            model, mode=scale_method, max_trials=25, batch_size_align=batch_size_align
+        )
+
+    # the doubled size is capped to the dataset length of 100, which is predicted to run out of memory
+    assert tried == expected_tried
+    assert new_batch_size == expected
+
+
+@pytest.mark.parametrize(
+    ["low", "high", "align", "expected"],
+    [
+        (4, 8, 1, 6),
+        (7, 8, 1, None),
+        (64, 256, 64, 128),
+        (64, 128, 64, None),
+        (100, 140, 64, 128),
+        (3, 17, 8, 8),
+        (180, 320, 64, 256),
+    ],
+)
+def test_aligned_midpoint(low, high, align, expected):
+    """Test that the binary search only tries multiples of the alignment between the bounds."""
+    midval = _aligned_midpoint(low, high, align)
+    assert midval == expected
+    if midval is not None:
+        # strictly between the bounds, so an already tried size is never tried again
+        assert low < midval < high
+
+
+def test_adjust_batch_size_unchanged_skips_setattr():
+    """Test that the batch size attribute is not set again if the batch size did not change."""
+    trainer = mock.Mock(train_dataloader=None)
+    trainer.lightning_module = BatchSizeModel(batch_size=8)
+
+    with mock.patch("pytorch_lightning.tuner.batch_size_scaling.lightning_setattr") as setattr_mock:
+        assert _adjust_batch_size(trainer, value=8) == (8, False)
+        setattr_mock.assert_not_called()
+        assert _adjust_batch_size(trainer, factor=2.0) == (16, True)
+        setattr_mock.assert_called_once_with(trainer.lightning_module, "batch_size", 16)
+
+
+def test_fast_clone():
+    """Test that the snapshot copy clones the tensors and keeps the state dict metadata."""
+    state_dict = BoringModel().state_dict()
+    checkpoint = {"state_dict": state_dict, "loops": {"fit_loop": {"epoch_progress": [1, (2, 3.0)]}}, "epoch": 0}
+
+    clone = _fast_clone(checkpoint)
+    assert clone["loops"] == checkpoint["loops"]
+    assert isinstance(clone["loops"]["fit_loop"]["epoch_progress"][1], tuple)
+    assert clone["state_dict"]._metadata == state_dict._metadata
+    for key, tensor in state_dict.items():
+        assert torch.equal(clone["state_dict"][key], tensor)
+        assert clone["state_dict"][key].data_ptr() != tensor.data_ptr()
+
+
+def test_adjust_batch_size_records_trials():
+    """Test that the adjustments are recorded to be logged together at the end of the search."""
+    trainer = mock.Mock(train_dataloader=None)
+    trainer.lightning_module = BatchSizeModel(batch_size=8)
+    search = _BatchSizeSearch()
+
+    _adjust_batch_size(trainer, factor=2.0, desc="succeeded", search=search)
+    _adjust_batch_size(trainer, factor=0.5, desc="failed", search=search)
+    assert search.trials == [(8, "succeeded", 16), (16, "failed", 8)]
+    assert search.summary() == "       8 succeeded, next 16\n      16 failed, next 8"
+
+    # the size recorded is the one set after capping to the dataset length
+    search.max_batch_size, search.max_batch_size_known = 12, True
+    _adjust_batch_size(trainer, factor=2.0, desc="succeeded", search=search)
+    assert search.trials[-1] == (8, "succeeded", 12)
+
+
+@RunIf(min_cuda_gpus=1)
+def test_fast_clone_to_cpu():
+    """Test that CUDA tensors are copied to host memory when offloading the snapshot."""
+    state_dict = BoringModel().cuda().state_dict()
+
+    clone = _fast_clone(state_dict, to_cpu=True)
+    for key, tensor in state_dict.items():
+        assert clone[key].device == torch.device("cpu")
+        assert not clone[key].is_pinned()
+        assert torch.equal(clone[key], tensor.cpu())